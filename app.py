@@ -1,34 +1,285 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 import pandas as pd
+import numpy as np
+import asyncio
 import os
 import re
-from typing import Dict
-from statistics import mean
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Tuple
 
-app = FastAPI()
+try:
+    import pyarrow.dataset as ds
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Set base path as constant
 BASE_PATH = "clean/"
 
+# Service level column shared by every contract file
+SERVICE_COL = 'DOMESTIC AIR SERVICE LEVEL'
+
+# Matches the spend suffix of a contract filename, e.g. "$2.2M.csv"
+SPEND_RE = re.compile(r'\$([0-9.,]+)([KM]?)\.csv$')
+
+# Multiplier for each spend suffix captured by SPEND_RE
+SPEND_MULTIPLIERS = {'': 1.0, 'K': 1e3, 'M': 1e6}
+
+# Shared pool for reading contract files in parallel
+LOAD_EXECUTOR = ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4))
+
+# Carrier -> (directory mtime, sorted spends, filenames), filled at startup
+CARRIER_INDEX: Dict[str, Tuple[float, List[float], List[str]]] = {}
+
 class SearchRequest(BaseModel):
     target_spend: float  # Target spend amount as a float
     carrier: str         # Carrier, e.g., 'UPS' or 'FedEx'
     tolerance: float     # Tolerance as a decimal (e.g., 0.2 for 20%)
     top_n: int          # Number of top service levels to return
 
-def normalize_discount(discount: float) -> float:
-    """Normalize discount value by dividing by 100 if it's greater than 100."""
-    return discount / 100 if discount > 100 else discount
+def normalize_discount(discounts: np.ndarray) -> np.ndarray:
+    """Normalize discount values in place, dividing those greater than 100 by 100."""
+    return np.divide(discounts, 100.0, out=discounts, where=discounts > 100)
+
+def discount_column(carrier: str) -> str:
+    """Return the name of a carrier's discount column, e.g. 'CURRENT UPS'."""
+    return f'CURRENT {carrier.upper()}'
+
+def read_contract_csv(path: str, current_col: str) -> pd.DataFrame:
+    """Read the service level and discount columns from a contract CSV.
+
+    Uses the multithreaded pyarrow CSV engine when pyarrow is installed,
+    otherwise falls back to the default pandas engine.
+    """
+    # Only read the two columns we need, parsing discounts straight to a
+    # nullable float column so no Python objects are created per value
+    kwargs = {
+        'usecols': [SERVICE_COL, current_col],
+        'dtype': {SERVICE_COL: 'string', current_col: 'Float64'},
+        'dtype_backend': 'numpy_nullable'
+    }
+    if HAS_PYARROW:
+        kwargs['engine'] = 'pyarrow'
+    try:
+        return pd.read_csv(path, **kwargs)
+    except ValueError:
+        # Missing columns are a real error, not something a text re-read can fix
+        header = pd.read_csv(path, nrows=0).columns
+        if SERVICE_COL not in header or current_col not in header:
+            raise
+        # Stray formatting in the discount column; read it as text and let
+        # the caller coerce invalid values
+        kwargs['dtype'] = {SERVICE_COL: 'string', current_col: 'string'}
+        return pd.read_csv(path, **kwargs)
+
+if HAS_NUMBA:
+    @njit(cache=True)
+    def aggregate_discounts(ids, discounts, n_services):
+        """Compute per-service sums, mins, maxs and counts in a single pass."""
+        sums = np.zeros(n_services)
+        mins = np.full(n_services, np.inf)
+        maxs = np.full(n_services, -np.inf)
+        counts = np.zeros(n_services, dtype=np.int64)
+        for i in range(ids.shape[0]):
+            k = ids[i]
+            if k < 0:
+                continue
+            d = discounts[i]
+            sums[k] += d
+            counts[k] += 1
+            if d < mins[k]:
+                mins[k] = d
+            if d > maxs[k]:
+                maxs[k] = d
+        return sums, mins, maxs, counts
+else:
+    def aggregate_discounts(ids, discounts, n_services):
+        """Compute per-service sums, mins, maxs and counts with numpy reductions."""
+        valid = ids >= 0
+        ids = ids[valid]
+        discounts = discounts[valid]
+        sums = np.bincount(ids, weights=discounts, minlength=n_services)
+        counts = np.bincount(ids, minlength=n_services)
+        mins = np.full(n_services, np.inf)
+        maxs = np.full(n_services, -np.inf)
+        np.minimum.at(mins, ids, discounts)
+        np.maximum.at(maxs, ids, discounts)
+        return sums, mins, maxs, counts
+
+def build_carrier_index(carrier: str) -> Tuple[List[float], List[str]]:
+    """
+    Scan a carrier directory and index its contract files by spend.
+
+    Args:
+        carrier: 'UPS' or 'FedEx'
+
+    Returns:
+        Tuple of (spends, filenames), both sorted by ascending spend
+    """
+    carrier_path = os.path.join(BASE_PATH, carrier)
+    with os.scandir(carrier_path) as it:
+        matches = [SPEND_RE.search(entry.name) for entry in it if entry.name.endswith('.csv')]
+    matches = [m for m in matches if m]
+    if not matches:
+        return [], []
+
+    # Parse every spend in one pass: mantissa times a K/M multiplier
+    mantissa = np.array([m.group(1).replace(',', '') for m in matches], dtype=np.float64)
+    multiplier = np.array([SPEND_MULTIPLIERS[m.group(2)] for m in matches])
+    spends = mantissa * multiplier
+    filenames = np.array([m.string for m in matches], dtype=object)
+
+    order = np.argsort(spends, kind='stable')
+    return spends[order].tolist(), filenames[order].tolist()
+
+def get_carrier_index(carrier: str) -> Tuple[List[float], List[str]]:
+    """Return the spend index for a carrier, rebuilding it if the directory changed."""
+    mtime = os.path.getmtime(os.path.join(BASE_PATH, carrier))
+    cached = CARRIER_INDEX.get(carrier)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, *build_carrier_index(carrier))
+        CARRIER_INDEX[carrier] = cached
+    return cached[1], cached[2]
+
+@lru_cache(maxsize=4096)
+def load_contract(path: str, mtime: float, current_col: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Load a contract file as parallel arrays of service levels and normalized discounts.
+
+    Results are cached per (path, mtime, current_col), so a contract is only
+    re-parsed when its file changes on disk.
+
+    Args:
+        path: Path to the contract CSV
+        mtime: Modification time of the file, used as part of the cache key
+        current_col: Name of the carrier's discount column
 
-def parse_spend(spend_str: str) -> float:
-    """Convert spend string from filename (like $670K or $2.2M) to float value."""
-    spend_str = spend_str.replace('$', '').replace(',', '')
-    if 'M' in spend_str:
-        return float(spend_str.replace('M', '')) * 1_000_000
-    elif 'K' in spend_str:
-        return float(spend_str.replace('K', '')) * 1_000
-    return float(spend_str)
+    Returns:
+        Tuple of (services, discounts) arrays with invalid discounts dropped
+    """
+    df = read_contract_csv(path, current_col)
+
+    # Coerce discounts to numeric, dropping invalid values
+    discounts = pd.to_numeric(df[current_col], errors='coerce').to_numpy(
+        dtype=np.float64, na_value=np.nan
+    )
+    valid = ~np.isnan(discounts)
+
+    services = df[SERVICE_COL].to_numpy(dtype=object)[valid]
+    discounts = normalize_discount(discounts[valid])
+    # Cached arrays are shared between requests, so guard against mutation
+    services.flags.writeable = False
+    discounts.flags.writeable = False
+    return services, discounts
+
+def select_contracts(
+    carrier: str,
+    lower_spend: float,
+    upper_spend: float
+) -> List[Tuple[str, float]]:
+    """Return (path, mtime) for each contract CSV whose spend falls within range."""
+    carrier_path = os.path.join(BASE_PATH, carrier)
+    spends, filenames = get_carrier_index(carrier)
+
+    start = bisect_left(spends, lower_spend)
+    end = bisect_right(spends, upper_spend)
+    paths = [os.path.join(carrier_path, filename) for filename in filenames[start:end]]
+    return [(path, os.path.getmtime(path)) for path in paths]
+
+def load_csv_contracts(
+    carrier: str,
+    contracts: List[Tuple[str, float]]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Load services and discounts from the given (path, mtime) contract CSVs."""
+    current_col = discount_column(carrier)
+    # Files are independent, so load them concurrently (parsing releases the GIL)
+    loaded = list(LOAD_EXECUTOR.map(
+        lambda contract: load_contract(*contract, current_col),
+        contracts
+    ))
+
+    if not loaded:
+        return np.empty(0, dtype=object), np.empty(0, dtype=np.float64)
+    services, discounts = (np.concatenate(arrays) for arrays in zip(*loaded))
+    return services, discounts
+
+def use_parquet(carrier: str, contracts: List[Tuple[str, float]]) -> bool:
+    """
+    Check whether a carrier's consolidated Parquet file is fresh enough to use.
+
+    Only the in-range contracts can change the answer, so the file must be newer
+    than those and than the carrier directory (which covers added or removed files).
+
+    Args:
+        carrier: 'UPS' or 'FedEx'
+        contracts: (path, mtime) of the in-range contract CSVs
+
+    Returns:
+        True if the Parquet file exists and is newer than all of them
+    """
+    parquet_path = os.path.join(BASE_PATH, f'{carrier}.parquet')
+    if not HAS_PYARROW or not os.path.exists(parquet_path):
+        return False
+    latest = os.path.getmtime(os.path.join(BASE_PATH, carrier))
+    for _, mtime in contracts:
+        latest = max(latest, mtime)
+    return os.path.getmtime(parquet_path) >= latest
+
+@lru_cache(maxsize=16)
+def load_parquet_table(path: str, mtime: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Load a consolidated Parquet file as spend-sorted arrays.
+
+    Results are cached per (path, mtime), so the file is scanned once and later
+    requests only slice the in-memory arrays.
+
+    Args:
+        path: Path to the carrier's Parquet file
+        mtime: Modification time of the file, used as part of the cache key
+
+    Returns:
+        Tuple of (spends, services, discounts) arrays sorted by spend
+    """
+    # Only the needed columns are read from the Arrow scan
+    table = ds.dataset(path, format='parquet').to_table(columns=['spend', 'service', 'discount'])
+    df = table.to_pandas()
+
+    spends = df['spend'].to_numpy(dtype=np.float64)
+    order = np.argsort(spends, kind='stable')
+    arrays = (
+        spends[order],
+        df['service'].to_numpy(dtype=object)[order],
+        df['discount'].to_numpy(dtype=np.float64)[order]
+    )
+    # Cached arrays are shared between requests, so guard against mutation
+    for array in arrays:
+        array.flags.writeable = False
+    return arrays
+
+def load_parquet_contracts(
+    carrier: str,
+    lower_spend: float,
+    upper_spend: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Load services and discounts from the carrier's Parquet file within the spend range."""
+    parquet_path = os.path.join(BASE_PATH, f'{carrier}.parquet')
+    spends, services, discounts = load_parquet_table(parquet_path, os.path.getmtime(parquet_path))
+
+    start = np.searchsorted(spends, lower_spend, side='left')
+    end = np.searchsorted(spends, upper_spend, side='right')
+    return services[start:end], discounts[start:end]
 
 def analyze_contracts(
     target_spend: float,
@@ -50,89 +301,84 @@ def analyze_contracts(
     """
     lower_spend = target_spend * (1 - tolerance)
     upper_spend = target_spend * (1 + tolerance)
-    carrier_path = os.path.join(BASE_PATH, carrier)
-    
-    service_discounts = {}
-
-    # Read all contract files in the carrier directory
-    for filename in os.listdir(carrier_path):
-        if filename.endswith('.csv'):
-            spend_match = re.search(r'\$(.+?)\.csv', filename)
-            if spend_match:
-                contract_spend = parse_spend(spend_match.group(1))
-                
-                # Check if contract is within spend range
-                if lower_spend <= contract_spend <= upper_spend:
-                    df = pd.read_csv(os.path.join(carrier_path, filename))
-                    current_col = f'CURRENT {carrier.upper()}'
-                    
-                    for _, row in df.iterrows():
-                        service = row['DOMESTIC AIR SERVICE LEVEL']
-                        try:
-                            discount = normalize_discount(float(row[current_col]))
-                            
-                            if service not in service_discounts:
-                                service_discounts[service] = []
-                            service_discounts[service].append(discount)
-                        except (ValueError, TypeError):
-                            continue  # Skip invalid values
-    
-    service_stats = {}
-    for service, discounts in service_discounts.items():
-        if discounts:
-            service_stats[service] = {
-                'avg_discount': mean(discounts),
-                'min_discount': min(discounts),
-                'max_discount': max(discounts),
-                'contract_count': len(discounts),
-                'discount_values': sorted(discounts)
-            }
-
-    # Sort by average discount and get top N
-    sorted_services = dict(sorted(
-        service_stats.items(),
-        key=lambda x: x[1]['avg_discount'],
-        reverse=True
-    )[:top_n])
-    
+    # An empty or NaN range matches no contracts; bisect would otherwise select all
+    if not lower_spend <= upper_spend:
+        return {}
+
+    contracts = select_contracts(carrier, lower_spend, upper_spend)
+    if use_parquet(carrier, contracts):
+        services, discounts = load_parquet_contracts(carrier, lower_spend, upper_spend)
+    else:
+        services, discounts = load_csv_contracts(carrier, contracts)
+
+    if not discounts.size:
+        return {}
+
+    # Map service names to integer ids; missing names get -1 and are skipped
+    ids, names = pd.factorize(services)
+    sums, mins, maxs, counts = aggregate_discounts(ids, discounts, len(names))
+
+    # Sort by (service, discount) so each service's values are one contiguous run
+    order = np.lexsort((discounts, ids))
+    offset = np.count_nonzero(ids < 0)
+    ends = offset + np.cumsum(counts)
+
+    # Rank services by average discount in one vectorized sort and keep the top N.
+    # sum / count can be off by an ulp from the exact mean, so rank on a rounded
+    # key to keep equal averages tied; the stable sort keeps first-seen order
+    avgs = sums / counts
+    top = np.argsort(-np.round(avgs, 12), kind='stable')[:top_n]
+
+    sorted_services = {}
+    for i in top:
+        sorted_services[names[i]] = {
+            'avg_discount': avgs[i],
+            'min_discount': mins[i],
+            'max_discount': maxs[i],
+            'contract_count': int(counts[i]),
+            'discount_values': discounts[order[ends[i] - counts[i]:ends[i]]]
+        }
+
     return sorted_services
 
+@app.on_event("startup")
+async def build_indexes():
+    """Index every carrier directory's contracts by spend on startup."""
+    for carrier in os.listdir(BASE_PATH):
+        if os.path.isdir(os.path.join(BASE_PATH, carrier)):
+            get_carrier_index(carrier)
+
 @app.post("/analyze_contracts/")
 async def analyze_contracts_endpoint(request: SearchRequest):
     """Endpoint to analyze contracts based on request parameters."""
     try:
-        results = analyze_contracts(
+        # Run the blocking file and numpy work in a worker thread
+        results = await asyncio.to_thread(
+            analyze_contracts,
             request.target_spend,
             request.carrier,
             request.tolerance,
             request.top_n
         )
-        return format_results(results)
+        # Return the response directly so orjson serializes the numpy values
+        return ORJSONResponse(format_results(results))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-def format_results(stats: Dict) -> str:
-    """Format results dictionary into the requested output string"""
-    output = []
-    
-    for service, data in stats.items():
-        # Multiply percentage values by 100 for display
-        avg_discount = data['avg_discount'] * 100
-        min_discount = data['min_discount'] * 100
-        max_discount = data['max_discount'] * 100
-        discount_values = [d * 100 for d in data['discount_values']]
-        
-        service_output = [
-            f"\nService Level: {service}",
-            f"Average Discount: {avg_discount:.2f}",
-            f"Min Discount: {min_discount:.2f}",
-            f"Max Discount: {max_discount:.2f}",
-            f"Contract Count: {data['contract_count']}",
-            f"Discount Values: {', '.join(f'{d:.2f}' for d in discount_values)}"
-        ]
-        output.extend(service_output)
-    
-    return "\n".join(output)
+def format_results(stats: Dict) -> List[Dict]:
+    """Format results dictionary into a list of per-service records, in percent"""
+    return [
+        {
+            'service': service,
+            # Multiply percentage values by 100 for display
+            'avg_discount': data['avg_discount'] * 100,
+            'min_discount': data['min_discount'] * 100,
+            'max_discount': data['max_discount'] * 100,
+            'contract_count': data['contract_count'],
+            'discount_values': data['discount_values'] * 100
+        }
+        for service, data in stats.items()
+    ]
 
 @app.get("/")
 async def read_root():
@@ -0,0 +1,50 @@
+"""
+Consolidate each carrier's contract CSVs into a single Parquet file.
+
+Writes clean/<carrier>.parquet with columns [spend, service, discount,
+contract_file], sorted by spend so readers can skip row groups outside a
+requested spend range. Discounts are already normalized. Re-run whenever
+contracts are added or changed.
+
+Run from the repository root: python build_parquet.py
+"""
+import os
+from typing import Optional
+
+import pandas as pd
+
+import app
+
+def build_carrier_parquet(carrier: str) -> Optional[str]:
+    """Write the consolidated Parquet file for one carrier; returns its path, or None if empty."""
+    carrier_path = os.path.join(app.BASE_PATH, carrier)
+    current_col = app.discount_column(carrier)
+    spends, filenames = app.build_carrier_index(carrier)
+
+    frames = []
+    for spend, filename in zip(spends, filenames):
+        path = os.path.join(carrier_path, filename)
+        services, discounts = app.load_contract(path, os.path.getmtime(path), current_col)
+        frames.append(pd.DataFrame({
+            'spend': spend,
+            'service': pd.array(services, dtype='string'),
+            'discount': discounts,
+            'contract_file': filename
+        }))
+
+    if not frames:
+        return None
+
+    df = pd.concat(frames, ignore_index=True)
+    parquet_path = os.path.join(app.BASE_PATH, f'{carrier}.parquet')
+    df.to_parquet(parquet_path, engine='pyarrow', index=False)
+    return parquet_path
+
+if __name__ == "__main__":
+    for carrier in sorted(os.listdir(app.BASE_PATH)):
+        if os.path.isdir(os.path.join(app.BASE_PATH, carrier)):
+            parquet_path = build_carrier_parquet(carrier)
+            if parquet_path:
+                print(f"Wrote {parquet_path}")
+            else:
+                print(f"Skipped {carrier}: no contract files")
@@ -0,0 +1,245 @@
+import math
+import os
+import re
+from statistics import mean
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import app
+from build_parquet import build_carrier_parquet
+
+CARRIER = 'TEST'
+CURRENT_COL = 'CURRENT TEST'
+
+CONTRACTS = {
+    'Contract_1_-_TEST_$1M.csv': [
+        ('Ground', '0.25'),
+        ('Next Day Air', '0.60'),
+        ('Next Day Air', '65'),      # not above 100, kept as is
+        ('2nd Day Air', '4500'),     # normalized to 45
+        ('', '0.30'),                # missing service name
+    ],
+    'Contract_2_-_TEST_$1.1M.csv': [
+        ('Ground', '0.35'),
+        ('Next Day Air', 'n/a'),     # invalid discount
+        ('2nd Day Air', '0.40'),
+    ],
+    'Contract_3_-_TEST_$900K.csv': [
+        ('Ground', '0.30'),
+        ('Next Day Air', '0.62'),
+    ],
+    # Outside the spend range below
+    'Contract_4_-_TEST_$5M.csv': [
+        ('Ground', '0.99'),
+    ],
+}
+
+def baseline_analyze(carrier_path, lower_spend, upper_spend, top_n, current_col=CURRENT_COL):
+    """The original dict-based aggregation, skipping rows without a service name."""
+    service_discounts = {}
+    for filename in sorted(os.listdir(carrier_path)):
+        mantissa, suffix = re.search(r'\$([\d.]+)([KM]?)\.csv', filename).groups()
+        spend = float(mantissa) * {'': 1, 'K': 1e3, 'M': 1e6}[suffix]
+        if lower_spend <= spend <= upper_spend:
+            df = pd.read_csv(os.path.join(carrier_path, filename))
+            for _, row in df.iterrows():
+                service = row['DOMESTIC AIR SERVICE LEVEL']
+                if pd.isna(service):
+                    continue
+                try:
+                    discount = float(row[current_col])
+                except (ValueError, TypeError):
+                    continue
+                if math.isnan(discount):
+                    continue
+                discount = discount / 100 if discount > 100 else discount
+                service_discounts.setdefault(service, []).append(discount)
+
+    service_stats = {}
+    for service, discounts in service_discounts.items():
+        service_stats[service] = {
+            'avg_discount': mean(discounts),
+            'min_discount': min(discounts),
+            'max_discount': max(discounts),
+            'contract_count': len(discounts),
+            'discount_values': sorted(discounts)
+        }
+    return dict(sorted(
+        service_stats.items(),
+        key=lambda x: x[1]['avg_discount'],
+        reverse=True
+    )[:top_n])
+
+@pytest.fixture
+def base_path(tmp_path, monkeypatch):
+    carrier_path = tmp_path / CARRIER
+    carrier_path.mkdir()
+    for filename, rows in CONTRACTS.items():
+        lines = [f'DOMESTIC AIR SERVICE LEVEL,WEIGHT RANGE,{CURRENT_COL}']
+        lines += [f'{service},All,{discount}' for service, discount in rows]
+        (carrier_path / filename).write_text('\n'.join(lines) + '\n')
+
+    monkeypatch.setattr(app, 'BASE_PATH', str(tmp_path))
+    monkeypatch.setattr(app, 'CARRIER_INDEX', {})
+    return tmp_path
+
+@pytest.mark.parametrize('top_n', [1, 2, 10])
+def test_analyze_contracts_matches_baseline(base_path, top_n):
+    expected = baseline_analyze(str(base_path / CARRIER), 800_000, 1_200_000, top_n)
+    results = app.analyze_contracts(1_000_000, CARRIER, 0.2, top_n)
+
+    assert list(results) == list(expected)
+    for service, data in results.items():
+        assert data['avg_discount'] == pytest.approx(expected[service]['avg_discount'])
+        assert data['min_discount'] == expected[service]['min_discount']
+        assert data['max_discount'] == expected[service]['max_discount']
+        assert data['contract_count'] == expected[service]['contract_count']
+        assert list(data['discount_values']) == expected[service]['discount_values']
+
+def test_analyze_contracts_values(base_path):
+    results = app.analyze_contracts(1_000_000, CARRIER, 0.2, 10)
+
+    assert list(results) == ['2nd Day Air', 'Next Day Air', 'Ground']
+    assert list(results['Next Day Air']['discount_values']) == [0.60, 0.62, 65.0]
+    assert list(results['2nd Day Air']['discount_values']) == [0.40, 45.0]
+    assert list(results['Ground']['discount_values']) == [0.25, 0.30, 0.35]
+    assert results['Ground']['contract_count'] == 3
+
+def test_analyze_contracts_keeps_exact_ties(base_path):
+    # Both services average exactly 0.45, but 0.42 + 0.47 + 0.46 divided by 3
+    # rounds to 0.44999999999999996; the first-seen service must stay first
+    carrier_path = base_path / 'TIES'
+    carrier_path.mkdir()
+    (carrier_path / 'Contract_1_-_TIES_$1M.csv').write_text(
+        'DOMESTIC AIR SERVICE LEVEL,WEIGHT RANGE,CURRENT TIES\n'
+        'Spread,All,0.42\n'
+        'Spread,All,0.47\n'
+        'Spread,All,0.46\n'
+        'Flat,All,0.45\n'
+    )
+
+    expected = baseline_analyze(str(carrier_path), 0, 2_000_000, 1, 'CURRENT TIES')
+    assert list(expected) == ['Spread']
+    assert list(app.analyze_contracts(1_000_000, 'TIES', 0.2, 1)) == ['Spread']
+    assert list(app.analyze_contracts(1_000_000, 'TIES', 0.2, 2)) == ['Spread', 'Flat']
+
+@pytest.mark.parametrize('target_spend, tolerance', [
+    (float('nan'), 0.2),
+    (1_000_000, float('nan')),
+    (1_000_000, -0.2),
+])
+def test_analyze_contracts_empty_range(base_path, target_spend, tolerance):
+    assert app.analyze_contracts(target_spend, CARRIER, tolerance, 10) == {}
+
+@pytest.mark.parametrize('has_pyarrow', [True, False])
+def test_read_contract_csv_missing_column_is_not_retried(base_path, monkeypatch, has_pyarrow):
+    path = base_path / 'missing.csv'
+    path.write_text('DOMESTIC AIR SERVICE LEVEL,WEIGHT RANGE\nGround,All\n')
+
+    calls = []
+    read_csv = pd.read_csv
+    def counting_read_csv(*args, **kwargs):
+        calls.append(kwargs)
+        return read_csv(*args, **kwargs)
+    monkeypatch.setattr(pd, 'read_csv', counting_read_csv)
+    monkeypatch.setattr(app, 'HAS_PYARROW', has_pyarrow)
+
+    with pytest.raises((ValueError, KeyError)):
+        app.read_contract_csv(str(path), CURRENT_COL)
+    # The typed read fails, but the file is never re-read with text discounts
+    assert not any(call.get('dtype', {}).get(CURRENT_COL) == 'string' for call in calls)
+
+@pytest.mark.parametrize('has_pyarrow', [True, False])
+def test_read_contract_csv_falls_back_to_text(base_path, monkeypatch, has_pyarrow):
+    path = base_path / 'stray.csv'
+    path.write_text(f'DOMESTIC AIR SERVICE LEVEL,WEIGHT RANGE,{CURRENT_COL}\nGround,All,0.35\nGround,All,35%\n')
+    monkeypatch.setattr(app, 'HAS_PYARROW', has_pyarrow)
+
+    df = app.read_contract_csv(str(path), CURRENT_COL)
+    assert list(df[CURRENT_COL]) == ['0.35', '35%']
+
+def test_load_contract_reloads_rewritten_csv(base_path):
+    assert app.analyze_contracts(1_000_000, CARRIER, 0.2, 10)['Ground']['max_discount'] == 0.35
+
+    path = base_path / CARRIER / 'Contract_2_-_TEST_$1.1M.csv'
+    path.write_text(f'DOMESTIC AIR SERVICE LEVEL,WEIGHT RANGE,{CURRENT_COL}\nGround,All,0.55\n')
+    # Make sure the new mtime differs even on filesystems with coarse timestamps
+    mtime = os.path.getmtime(path) + 10
+    os.utime(path, (mtime, mtime))
+
+    results = app.analyze_contracts(1_000_000, CARRIER, 0.2, 10)
+    assert results['Ground']['max_discount'] == 0.55
+    assert list(results['2nd Day Air']['discount_values']) == [45.0]
+
+def test_carrier_index_picks_up_added_and_removed_files(base_path):
+    carrier_path = base_path / CARRIER
+    assert app.analyze_contracts(1_000_000, CARRIER, 0.2, 10)['Ground']['contract_count'] == 3
+
+    def touch_dir():
+        # Adding or removing a file updates the directory mtime; bump it
+        # explicitly so the change is visible with coarse timestamps
+        mtime = os.path.getmtime(carrier_path) + 10
+        os.utime(carrier_path, (mtime, mtime))
+
+    (carrier_path / 'Contract_5_-_TEST_$950K.csv').write_text(
+        f'DOMESTIC AIR SERVICE LEVEL,WEIGHT RANGE,{CURRENT_COL}\nGround,All,0.90\n'
+    )
+    touch_dir()
+    results = app.analyze_contracts(1_000_000, CARRIER, 0.2, 10)
+    assert results['Ground']['contract_count'] == 4
+    assert results['Ground']['max_discount'] == 0.90
+
+    (carrier_path / 'Contract_1_-_TEST_$1M.csv').unlink()
+    touch_dir()
+    results = app.analyze_contracts(1_000_000, CARRIER, 0.2, 10)
+    assert list(results['Ground']['discount_values']) == [0.30, 0.35, 0.90]
+    assert '2nd Day Air' in results and list(results['2nd Day Air']['discount_values']) == [0.40]
+
+def test_use_parquet_detects_edited_csv(base_path):
+    csv_results = app.analyze_contracts(1_000_000, CARRIER, 0.2, 10)
+    parquet_path = build_carrier_parquet(CARRIER)
+    contracts = app.select_contracts(CARRIER, 800_000, 1_200_000)
+    assert app.use_parquet(CARRIER, contracts)
+
+    parquet_results = app.analyze_contracts(1_000_000, CARRIER, 0.2, 10)
+    assert list(parquet_results) == list(csv_results)
+
+    # Later requests, even with different bounds, reuse the loaded table
+    misses = app.load_parquet_table.cache_info().misses
+    app.analyze_contracts(950_000, CARRIER, 0.1, 10)
+    assert app.load_parquet_table.cache_info().misses == misses
+    for service, data in parquet_results.items():
+        assert list(data['discount_values']) == list(csv_results[service]['discount_values'])
+
+    # Editing a CSV in place leaves the directory mtime unchanged; only edits to
+    # in-range contracts can change the answer
+    parquet_mtime = os.path.getmtime(parquet_path)
+    os.utime(base_path / CARRIER / 'Contract_4_-_TEST_$5M.csv', (parquet_mtime + 10, parquet_mtime + 10))
+    assert app.use_parquet(CARRIER, app.select_contracts(CARRIER, 800_000, 1_200_000))
+
+    os.utime(base_path / CARRIER / 'Contract_1_-_TEST_$1M.csv', (parquet_mtime + 10, parquet_mtime + 10))
+    assert not app.use_parquet(CARRIER, app.select_contracts(CARRIER, 800_000, 1_200_000))
+
+def test_analyze_contracts_endpoint_reports_percentages(base_path):
+    response = TestClient(app.app).post('/analyze_contracts/', json={
+        'target_spend': 1_000_000,
+        'carrier': CARRIER,
+        'tolerance': 0.2,
+        'top_n': 10
+    })
+
+    assert response.status_code == 200
+    ground = response.json()[2]
+    assert ground['service'] == 'Ground'
+    assert ground['avg_discount'] == pytest.approx(30.0)
+    assert ground['min_discount'] == pytest.approx(25.0)
+    assert ground['max_discount'] == pytest.approx(35.0)
+    assert ground['contract_count'] == 3
+    assert ground['discount_values'] == pytest.approx([25.0, 30.0, 35.0])
+
+def test_build_carrier_parquet_skips_empty_carrier(base_path):
+    (base_path / 'EMPTY').mkdir()
+    assert build_carrier_parquet('EMPTY') is None
+    assert not (base_path / 'EMPTY.parquet').exists()